@@ -1,11 +1,38 @@
 import os
+import asyncio
+import threading
+import faiss
+import httpx
 import streamlit as st
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import List
+from openai import AsyncOpenAI
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain.vectorstores import FAISS
-from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
+from langchain.vectorstores.utils import DistanceStrategy, maximal_marginal_relevance
+from langchain.docstore.base import Docstore
+from langchain.memory import ConversationSummaryBufferMemory
 from langchain.prompts import PromptTemplate
+from langchain.schema import BaseRetriever, Document
+from langchain.schema.output_parser import StrOutputParser
+
+INDEX_DIR = "vectorstore"
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 512  # Shortened embeddings; must match ingest.py
+HNSW_EF_SEARCH = 64  # Candidate list size per query; higher is slower but more accurate
+HNSW_MAX_FILTERED_EF_SEARCH = 2048  # Upper bound for the candidate list when a pricing filter is set
+RECENT_QUERIES = 2  # Earlier user questions searched alongside the current one
+EMBEDDING_CACHE_SIZE = 512  # Query embeddings kept in memory across sessions
+MEMORY_TOKEN_LIMIT = 500  # Chat history beyond this is summarized
+CHAT_MODEL = "gpt-4o-mini"  # Supports automatic prompt caching
+MAX_OPENAI_CONNECTIONS = 100  # Concurrent chat requests across all sessions
 
 # Page configuration
 st.set_page_config(
@@ -48,46 +75,201 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+class ParquetDocstore(Docstore):
+    """Docstore over a parquet file loaded as an Arrow table, building a Document only when a row is requested"""
+
+    def __init__(self, path):
+        # read_table decodes every row group up front, so the whole table is
+        # resident; memory_map only avoids an extra copy of the file bytes
+        self.table = pq.read_table(path, memory_map=True)
+
+    def search(self, search):
+        row = self.table.slice(int(search), 1).to_pylist()[0]
+        del row["id"]
+        return Document(page_content=row.pop("content"), metadata=row)
+
+    def ids_where(self, column, values):
+        """Return the ids of documents whose column holds one of values"""
+        mask = pc.is_in(self.table[column], value_set=pa.array(values))
+        return self.table.filter(mask)["id"].to_numpy()
+
 @st.cache_resource
 def load_vectorstore():
     """Load the FAISS vectorstore with AI tools data"""
     try:
-        embeddings = OpenAIEmbeddings()
-        vectorstore = FAISS.load_local(
-            "vectorstore", 
-            embeddings,
-            allow_dangerous_deserialization=True
+        embeddings = OpenAIEmbeddings(
+            model=EMBEDDING_MODEL,
+            dimensions=EMBEDDING_DIMENSIONS,
+            # The pinned tiktoken predates text-embedding-3; count tokens with
+            # the same cl100k encoding instead of logging a fallback per query
+            tiktoken_model_name="text-embedding-ada-002"
+        )
+        
+        index = faiss.read_index(os.path.join(INDEX_DIR, "index.faiss"))
+        
+        # Row i of the docstore holds the document for index id i
+        vectorstore = FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=ParquetDocstore(os.path.join(INDEX_DIR, "docs.parquet")),
+            index_to_docstore_id={i: str(i) for i in range(index.ntotal)},
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
         )
+        vectorstore.index.hnsw.efSearch = HNSW_EF_SEARCH
         return vectorstore
     except Exception as e:
         st.error(f"Error loading vectorstore: {str(e)}")
         st.info("Please make sure you've run ingest.py first to build the index.")
         return None
 
+def normalize_query(text):
+    """Collapse whitespace so trivially different queries share cache entries"""
+    return " ".join(text.split())
+
 @st.cache_resource
-def get_conversation_chain(_vectorstore):
-    """Create the conversational chain"""
-    llm = ChatOpenAI(
-        model="gpt-3.5-turbo",
-        temperature=0.7
-    )
+def get_embedding_cache():
+    """Create the per-query embedding LRU cache and its lock, shared by all sessions"""
+    return OrderedDict(), threading.Lock()
+
+def embed_queries(embeddings, queries):
+    """Embed a batch of queries, sending only the uncached ones in a single request"""
+    cache, lock = get_embedding_cache()
+    with lock:
+        vectors = {q: cache[q] for q in queries if q in cache}
+        for q in vectors:
+            cache.move_to_end(q)
+    
+    missing = [q for q in queries if q not in vectors]
+    if missing:
+        # The API returns unit-length vectors even when shortened, matching
+        # the normalized index vectors without another division
+        new_vectors = dict(zip(missing, np.array(embeddings.embed_documents(missing), dtype=np.float32)))
+        vectors.update(new_vectors)
+        with lock:
+            cache.update(new_vectors)
+            while len(cache) > EMBEDDING_CACHE_SIZE:
+                cache.popitem(last=False)
+    
+    return np.vstack([vectors[q] for q in queries])
+
+@st.cache_resource
+def get_pricing_selector(_vectorstore, pricing):
+    """Build an index ID selector for tools with one of the given pricing models and count them, shared by all sessions"""
+    ids = _vectorstore.docstore.ids_where("pricing", list(pricing)).astype(np.int64)
+    return faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids)), len(ids)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def search_tools(_vectorstore, queries, k, fetch_k, lambda_mult, pricing):
+    """Retrieve k relevant and diverse tools for a batch of queries with one index search, cached across reruns and sessions"""
+    embeddings = embed_queries(_vectorstore.embedding_function, queries)
+    
+    # Restrict the graph search itself to tools with the selected pricing models
+    params = None
+    if pricing:
+        selector, selected_count = get_pricing_selector(_vectorstore, pricing)
+        if not selected_count:
+            return []
+        # Most visited nodes fail a narrow selector, so widen the candidate
+        # list by the inverse of the selected fraction to keep recall
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = min(
+            HNSW_EF_SEARCH * -(-_vectorstore.index.ntotal // selected_count),
+            HNSW_MAX_FILTERED_EF_SEARCH
+        )
+        params.sel = selector
+    scores, indices = _vectorstore.index.search(embeddings, fetch_k, params=params)
     
-    memory = ConversationBufferMemory(
-        memory_key="chat_history",
-        return_messages=True,
-        output_key="answer"
+    # The current question's hits always make up the pool; recent questions
+    # only top it up, so they cannot crowd out the current results
+    candidate_ids = [i for i in dict.fromkeys(indices[0].tolist()) if i != -1]
+    if len(candidate_ids) < fetch_k:
+        best_scores = {}
+        for i, score in zip(indices[1:].ravel().tolist(), scores[1:].ravel().tolist()):
+            if i != -1 and i not in candidate_ids and score > best_scores.get(i, float("-inf")):
+                best_scores[i] = score
+        top_up = sorted(best_scores, key=best_scores.get, reverse=True)
+        candidate_ids += top_up[:fetch_k - len(candidate_ids)]
+    if not candidate_ids:
+        return []
+    
+    # Re-rank the candidates with MMR against the primary query to avoid near-duplicates
+    candidate_embeddings = np.vstack([_vectorstore.index.reconstruct(i) for i in candidate_ids])
+    selected = maximal_marginal_relevance(
+        embeddings[0],
+        candidate_embeddings,
+        lambda_mult=lambda_mult,
+        k=k
     )
     
-    # Custom prompt template
-    template = """
-You are an expert AI tools advisor with deep knowledge of 16,000+ AI tools.
-Use the following context to answer questions about AI tools.
+    return [
+        _vectorstore.docstore.search(_vectorstore.index_to_docstore_id[candidate_ids[j]])
+        for j in selected
+    ]
 
-Context: {context}
+class CachedToolRetriever(BaseRetriever):
+    """Retriever that searches the query together with recent user questions, served from cache when repeated"""
+    vectorstore: FAISS
+    k: int = 5
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+    recent_queries: List[str] = []
+    pricing: List[str] = []
 
-Chat History: {chat_history}
+    class Config:
+        arbitrary_types_allowed = True
 
-Question: {question}
+    def _get_relevant_documents(self, query, *, run_manager):
+        queries = dict.fromkeys(normalize_query(q) for q in [query, *self.recent_queries])
+        return search_tools(
+            self.vectorstore,
+            tuple(queries),
+            self.k,
+            self.fetch_k,
+            self.lambda_mult,
+            tuple(sorted(self.pricing))
+        )
+
+@st.cache_resource
+def get_event_loop():
+    """Start a background event loop on which every session's chain runs concurrently"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+@st.cache_resource
+def get_memory_executor():
+    """Create the thread pool that updates chat memories off the response path, shared by all sessions"""
+    return ThreadPoolExecutor(max_workers=4)
+
+@st.cache_resource
+def get_llm():
+    """Create the streaming chat model, shared by all sessions"""
+    async_client = AsyncOpenAI(
+        http_client=httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(retries=2),
+            limits=httpx.Limits(max_connections=MAX_OPENAI_CONNECTIONS)
+        )
+    )
+    return ChatOpenAI(
+        model=CHAT_MODEL,
+        temperature=0.7,
+        streaming=True,
+        # The pinned tiktoken predates gpt-4o; count tokens (for the chat
+        # memory's pruning) with the gpt-4 encoding instead of failing
+        tiktoken_model_name="gpt-4",
+        async_client=async_client.chat.completions
+    )
+
+def format_docs(docs):
+    """Join retrieved documents into the prompt context"""
+    return "\n\n".join(doc.page_content for doc in docs)
+
+# Answer prompt. Everything before "Context:" is identical on every request,
+# so OpenAI's automatic prompt caching can reuse it; it is kept above the
+# 1024-token minimum that caching requires. Per-turn inputs go last.
+PROMPT_TEMPLATE = """
+You are an expert AI tools advisor with deep knowledge of 16,000+ AI tools.
+Use the context provided at the end of this message to answer questions about AI tools.
 
 Instructions:
 1. Recommend 3-7 relevant AI tools based on the user's needs
@@ -101,23 +283,102 @@ Instructions:
 4. If unsure, admit it and suggest alternatives
 5. Format your response in a clear, readable way
 
+Recommendation guidelines:
+- Only recommend tools that appear in the context. Do not invent tools, features, prices or websites.
+- Prefer tools whose primary task matches the user's goal over tools that only mention it as a keyword.
+- When several tools are similar, say briefly how they differ, for example in pricing, focus or maturity.
+- Mention the website when the context includes one, so the user can verify details.
+- If the user names a budget, team size, industry or country, take it into account and say how.
+- If none of the retrieved tools fit the request, say so plainly and suggest how the user could rephrase it.
+- Keep follow-up answers consistent with earlier recommendations in the chat history unless the user asks for alternatives.
+- Pricing and features change often; remind the user to confirm them on the tool's website when it matters.
+
+Pricing models:
+- Free: the tool can be used without paying, possibly with usage limits.
+- Freemium: a free tier exists, with paid plans that unlock more usage, features or seats.
+- Paid: the tool requires a subscription or one-time purchase, sometimes after a free trial.
+- Contact for Pricing: pricing is negotiated with the vendor, usually for business or enterprise customers.
+
+Tool category glossary:
+- Communication: chatbots, email assistants, meeting schedulers, transcription and note-taking tools, and customer support agents that help people and teams talk to each other or to their customers.
+- Content Creation: tools that generate or edit text, images, audio and video, including copywriting assistants, blog writers, social media post generators, presentation builders and design helpers.
+- Image Generation: text-to-image models, photo editors, background removers, upscalers, avatar and logo generators, and tools that restyle or extend existing images.
+- Video: text-to-video generators, AI video editors, subtitle and dubbing tools, talking-avatar presenters, and tools that turn long recordings into short clips.
+- Audio and Voice: text-to-speech voices, voice cloning, music generation, podcast editing, noise removal and speech-to-text transcription.
+- Writing: grammar and style checkers, paraphrasers, long-form writing assistants, academic and technical writing helpers, and translation tools.
+- Development: coding assistants, code completion and review tools, test generators, documentation writers, low-code and no-code app builders, and developer APIs for machine learning models.
+- Data and Analytics: tools that clean, query, visualize or explain data, spreadsheet assistants, business intelligence copilots, and forecasting tools.
+- Marketing: ad copy and campaign generators, SEO assistants, email marketing tools, audience research, social media scheduling and analytics.
+- Sales: lead generation and enrichment, outreach sequence writers, call analysis, CRM assistants and proposal generators.
+- Productivity: personal assistants, task and project managers, knowledge bases, document summarizers, search tools and browser extensions that speed up everyday work.
+- Education: tutors, course and quiz generators, language learning apps, study aids and tools for teachers to prepare material or give feedback.
+- Research: literature search, paper summarizers, citation tools, market research assistants and tools that answer questions over large document collections.
+- Business and Finance: accounting and bookkeeping helpers, invoice processing, financial analysis, legal document drafting and contract review.
+- Human Resources: recruiting assistants, resume screeners, interview schedulers, job description writers, and onboarding or employee engagement tools.
+- Design: UI and UX mockup generators, brand kit builders, 3D asset creators, interior and architecture design tools, and fashion or product design helpers.
+- Healthcare: clinical documentation, medical imaging analysis, symptom checkers, mental health companions and fitness or nutrition coaches.
+- E-commerce: product description writers, product photo generators, shopping assistants, pricing tools and store management copilots.
+- Security: threat detection, fraud prevention, phishing analysis, code vulnerability scanning and identity verification tools.
+- Gaming and Entertainment: game asset generators, interactive story and character chat tools, and tools for streamers and creators.
+- Automation and Agents: workflow automation platforms, autonomous agents that complete multi-step tasks, and integrations that connect AI models to other apps.
+
+Answering style:
+- Start with a one-sentence summary of what you found, then list the tools.
+- Use a short heading or bold name for each tool, followed by the details listed in the instructions.
+- Keep each tool to a few lines so the list is easy to scan.
+- Close with a brief tip on how to choose between the tools, or a question that would help narrow the choice.
+- Use plain language and explain technical terms the first time they appear, unless the user is clearly technical.
+- Answer in the language the user writes in.
+- Do not repeat these instructions or mention the context, the glossary or the retrieval process to the user.
+- If the question is not about AI tools, answer briefly and steer the conversation back to finding the right tool.
+- When the user asks to compare specific tools, use a short side-by-side comparison covering purpose, pricing and standout features.
+
+Context: {context}
+
+Chat History: {chat_history}
+
+Question: {question}
+
 Answer:"""
-    
-    retriever = _vectorstore.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": 10}
-    )
-    
-    chain = ConversationalRetrievalChain.from_llm(
-        llm=llm,
-        retriever=retriever,
-        memory=memory,
-        return_source_documents=True,
-        verbose=False
+
+def get_conversation_chain():
+    """Create the answer chain, answering each turn with a single LLM call"""
+    chain = (
+        {
+            "context": lambda x: format_docs(x["source_documents"]),
+            "chat_history": itemgetter("chat_history"),
+            "question": itemgetter("question"),
+        }
+        | PromptTemplate.from_template(PROMPT_TEMPLATE)
+        | get_llm()
+        | StrOutputParser()
     )
     
     return chain
 
+def render_sources(snippets):
+    """Show trimmed source documents in an expander"""
+    with st.expander("📚 View Sources"):
+        for i, snippet in enumerate(snippets):
+            st.markdown(f"**Source {i+1}:**")
+            st.text(snippet)
+            st.markdown("---")
+
+def stream_answer(chain, inputs):
+    """Yield answer tokens as they arrive"""
+    # Run the chain on the shared event loop so concurrent sessions overlap
+    # their OpenAI requests, and hand each chunk back to this script thread
+    loop = get_event_loop()
+    chunks = chain.astream(inputs)
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(chunks.__anext__(), loop).result()
+            except StopAsyncIteration:
+                break
+    finally:
+        asyncio.run_coroutine_threadsafe(chunks.aclose(), loop).result()
+
 def main():
     # Header
     st.markdown("<h1>🤖 AI Tool Advisor</h1>", unsafe_allow_html=True)
@@ -165,7 +426,7 @@ def main():
         Built with:
         - Streamlit
         - LangChain
-        - OpenAI GPT-3.5
+        - OpenAI GPT-4o mini
         - FAISS Vector DB
         
         [GitHub Repository](https://github.com/amalsp220/ai-tools-chatbot)
@@ -174,19 +435,22 @@ def main():
     # Initialize session state
     if "messages" not in st.session_state:
         st.session_state.messages = []
-    if "conversation" not in st.session_state:
-        with st.spinner("Loading AI Tools database..."):
-            vectorstore = load_vectorstore()
-            if vectorstore:
-                st.session_state.conversation = get_conversation_chain(vectorstore)
-                st.session_state.vectorstore_loaded = True
-            else:
-                st.session_state.vectorstore_loaded = False
+    if "conversation" not in st.session_state and VECTORSTORE is not None:
+        st.session_state.retriever = CachedToolRetriever(vectorstore=VECTORSTORE)
+        st.session_state.memory = ConversationSummaryBufferMemory(
+            llm=get_llm(),
+            max_token_limit=MEMORY_TOKEN_LIMIT,
+            memory_key="chat_history",
+            output_key="answer"
+        )
+        st.session_state.conversation = get_conversation_chain()
     
     # Display chat messages
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
+            if message.get("sources"):
+                render_sources(message["sources"])
     
     # Handle suggested prompts
     if "suggested_prompt" in st.session_state:
@@ -202,33 +466,57 @@ def main():
             st.markdown(user_input)
         
         # Generate response
-        if st.session_state.get("vectorstore_loaded", False):
+        if VECTORSTORE is not None:
             with st.chat_message("assistant"):
-                with st.spinner("Searching through 16K+ AI tools..."):
-                    try:
-                        # Add pricing filter to query if selected
-                        query = user_input
-                        if pricing_filter:
-                            query += f" Only show tools with pricing: {', '.join(pricing_filter)}."
-                        
-                        response = st.session_state.conversation({"question": query})
-                        answer = response["answer"]
-                        
-                        st.markdown(answer)
-                        
-                        # Show source documents in expander
-                        if "source_documents" in response:
-                            with st.expander("📚 View Sources"):
-                                for i, doc in enumerate(response["source_documents"][:5]):
-                                    st.markdown(f"**Source {i+1}:**")
-                                    st.text(doc.page_content[:300] + "...")
-                                    st.markdown("---")
-                        
-                        st.session_state.messages.append({"role": "assistant", "content": answer})
-                    except Exception as e:
-                        error_msg = f"Error: {str(e)}"
-                        st.error(error_msg)
-                        st.session_state.messages.append({"role": "assistant", "content": error_msg})
+                try:
+                    # Only retrieve tools matching the selected pricing models
+                    st.session_state.retriever.pricing = pricing_filter
+                    
+                    # Search recent user questions in the same batch as the current one
+                    user_questions = [m["content"] for m in st.session_state.messages if m["role"] == "user"]
+                    st.session_state.retriever.recent_queries = user_questions[-(RECENT_QUERIES + 1):]
+                    
+                    # Retrieve on the script thread, where the Streamlit caches
+                    # are available; follow-up questions are not rephrased by
+                    # the LLM first, the recent user questions cover them
+                    source_documents = st.session_state.retriever.invoke(user_input)
+                    
+                    # Wait for the previous turn's memory update before reading the history
+                    pending = st.session_state.pop("memory_update", None)
+                    if pending is not None and pending.exception() is not None:
+                        st.warning(f"Could not update chat history: {pending.exception()}")
+                    
+                    # Stream the answer as it is generated
+                    inputs = {
+                        "question": user_input,
+                        "chat_history": st.session_state.memory.load_memory_variables({})["chat_history"],
+                        "source_documents": source_documents,
+                    }
+                    answer = st.write_stream(
+                        stream_answer(st.session_state.conversation, inputs)
+                    )
+                    
+                    # Saving may summarize older turns with an extra LLM call, so run
+                    # it in the background; the next turn waits for it above
+                    st.session_state.memory_update = get_memory_executor().submit(
+                        st.session_state.memory.save_context,
+                        {"question": user_input},
+                        {"answer": answer}
+                    )
+                    
+                    # Show source documents in expander, keeping the snippets with
+                    # the message so the history shows them on later reruns
+                    snippets = [doc.page_content[:300] + "..." for doc in source_documents[:5]]
+                    if snippets:
+                        render_sources(snippets)
+                    
+                    st.session_state.messages.append(
+                        {"role": "assistant", "content": answer, "sources": snippets}
+                    )
+                except Exception as e:
+                    error_msg = f"Error: {str(e)}"
+                    st.error(error_msg)
+                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
         else:
             st.error("Vectorstore not loaded. Please check the setup.")
 
@@ -244,4 +532,8 @@ if __name__ == "__main__":
         """)
         st.stop()
     
+    # Shared by every session in this process; only the chain and its memory are per session
+    with st.spinner("Loading AI Tools database..."):
+        VECTORSTORE = load_vectorstore()
+    
     main()
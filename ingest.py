@@ -1,7 +1,11 @@
 import os
+import asyncio
+import faiss
+import numpy as np
 import pandas as pd
-from langchain_openai import OpenAIEmbeddings
-from langchain.vectorstores import FAISS
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openai import AsyncOpenAI
 from langchain.docstore.document import Document
 from dotenv import load_dotenv
 
@@ -10,6 +14,43 @@ load_dotenv()
 # Configuration
 CSV_PATH = "data/ai_tools.csv"
 INDEX_DIR = "vectorstore"
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 512  # Shortened embeddings; must match app.py
+EMBEDDING_BATCH_SIZE = 512  # Texts per embeddings request
+EMBEDDING_CONCURRENCY = 20  # Embeddings requests in flight at once
+INDEX_ADD_BATCH_SIZE = 4096  # Vectors added to the index at a time
+EMBEDDINGS_PATH = "data/embeddings.f32"  # Scratch file holding embeddings until indexed
+HNSW_M = 32  # Graph neighbours per vector
+HNSW_EF_CONSTRUCTION = 200  # Candidate list size while building the graph
+
+# Label and CSV column for each line of a tool's document
+DOCUMENT_FIELDS = (
+    ("Tool Name", "Name"),
+    ("Category", "Category"),
+    ("Primary Task", "Primary Task"),
+    ("Description", "Short Description"),
+    ("Keywords", "Keywords"),
+    ("Technologies", "technologies"),
+    ("Industry", "industry"),
+    ("Pricing", "Pricing"),
+    ("Country", "Country"),
+    ("Year Founded", "Year Founded"),
+    ("Website", "Website"),
+)
+
+DOCUMENT_COLUMNS = [column for _, column in DOCUMENT_FIELDS]
+
+# Metadata key and CSV column stored with each document
+METADATA_FIELDS = {
+    "name": "Name",
+    "category": "Category",
+    "primary_task": "Primary Task",
+    "pricing": "Pricing",
+    "website": "Website",
+    "country": "Country",
+    "year_founded": "Year Founded",
+    "technologies": "technologies",
+}
 
 def load_and_prepare_data():
     """
@@ -33,60 +74,76 @@ def load_and_prepare_data():
     
     print(f"Processing {len(df)} valid tools...")
     
-    documents = []
+    # Cast once so both the text and the metadata are built from strings
+    df[DOCUMENT_COLUMNS] = df[DOCUMENT_COLUMNS].astype(str)
     
-    for idx, row in df.iterrows():
-        # Create a comprehensive text representation of each tool
-        text_content = f"""
-Tool Name: {row.get('Name', '')}
-
-Category: {row.get('Category', '')}
-
-Primary Task: {row.get('Primary Task', '')}
-
-Description: {row.get('Short Description', '')}
-
-Keywords: {row.get('Keywords', '')}
-
-Technologies: {row.get('technologies', '')}
-
-Industry: {row.get('industry', '')}
-
-Pricing: {row.get('Pricing', 'Not specified')}
-
-Country: {row.get('Country', '')}
-
-Year Founded: {row.get('Year Founded', '')}
-
-Website: {row.get('Website', '')}
-""".strip()
-        
-        # Create metadata dictionary
-        metadata = {
-            "name": str(row.get('Name', '')),
-            "category": str(row.get('Category', '')),
-            "primary_task": str(row.get('Primary Task', '')),
-            "pricing": str(row.get('Pricing', 'Not specified')),
-            "website": str(row.get('Website', '')),
-            "country": str(row.get('Country', '')),
-            "year_founded": str(row.get('Year Founded', '')),
-            "technologies": str(row.get('technologies', '')),
-        }
-        
-        # Create Document object
-        doc = Document(
-            page_content=text_content,
-            metadata=metadata
-        )
-        documents.append(doc)
-        
-        # Progress indicator
-        if (idx + 1) % 1000 == 0:
-            print(f"Processed {idx + 1}/{len(df)} tools...")
+    # Create a comprehensive text representation of every tool at once
+    lines = [label + ": " + df[column] for label, column in DOCUMENT_FIELDS]
+    page_contents = lines[0].str.cat(lines[1:], sep="\n\n")
+    
+    metadatas = (
+        df[list(METADATA_FIELDS.values())]
+        .rename(columns={column: key for key, column in METADATA_FIELDS.items()})
+        .to_dict(orient="records")
+    )
+    
+    documents = [
+        Document(page_content=page_content, metadata=metadata)
+        for page_content, metadata in zip(page_contents, metadatas)
+    ]
     
     print(f"\nSuccessfully prepared {len(documents)} documents for embedding")
     return documents
 
+async def embed_texts(texts, out):
+    """
+    Embed texts with concurrent batched requests to the OpenAI API.
+    
+    Args:
+        texts: List of strings to embed
+        out: Float32 array of shape (len(texts), EMBEDDING_DIMENSIONS);
+            row i receives the L2-normalized embedding of texts[i]
+    """
+    client = AsyncOpenAI(max_retries=5)
+    semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+    starts = range(0, len(texts), EMBEDDING_BATCH_SIZE)
+    
+    async def embed_batch(batch_num, start):
+        batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+        async with semaphore:
+            response = await client.embeddings.create(
+                model=EMBEDDING_MODEL,
+                dimensions=EMBEDDING_DIMENSIONS,
+                input=batch
+            )
+        batch_vectors = np.asarray(
+            [item.embedding for item in sorted(response.data, key=lambda item: item.index)],
+            dtype=np.float32
+        )
+        # Unit length makes the index's inner product an exact cosine similarity
+        faiss.normalize_L2(batch_vectors)
+        out[start:start + len(batch)] = batch_vectors
+        print(f"Embedded batch {batch_num + 1}/{len(starts)}")
+    
+    await asyncio.gather(
+        *[embed_batch(batch_num, start) for batch_num, start in enumerate(starts)]
+    )
+    await client.close()
+
+def write_docstore(documents, path):
+    """
+    Write documents to a parquet file, one row per document.
+    
+    Args:
+        documents: List of Document objects, in index order
+        path: Destination parquet file
+    """
+    table = pa.Table.from_pylist([
+        {"id": i, "content": doc.page_content, **doc.metadata}
+        for i, doc in enumerate(documents)
+    ])
+    pq.write_table(table, path)
+
 def build_vectorstore(documents):
     """
     Build FAISS vectorstore from documents.
@@ -94,22 +151,46 @@ def build_vectorstore(documents):
     Args:
         documents: List of Document objects
     """
-    print("\nInitializing OpenAI embeddings...")
-    embeddings = OpenAIEmbeddings()
-    
-    print("Building FAISS vectorstore (this may take a few minutes)...")
+    print("\nBuilding FAISS vectorstore (this may take a few minutes)...")
     print("Progress: Creating embeddings for all documents...")
     
-    # Create vectorstore
-    vectorstore = FAISS.from_documents(
-        documents=documents,
-        embedding=embeddings
-    )
+    texts = [doc.page_content for doc in documents]
     
-    # Save vectorstore locally
+    # Embedding batches are written straight into a file-backed array
+    # instead of being collected as nested Python lists of floats first
+    vectors = np.memmap(
+        EMBEDDINGS_PATH,
+        mode="w+",
+        dtype=np.float32,
+        shape=(len(texts), EMBEDDING_DIMENSIONS)
+    )
+    try:
+        asyncio.run(embed_texts(texts, vectors))
+        
+        # HNSW graph index for sub-linear search over FP16-quantized vectors,
+        # halving the bytes read per distance. The vectors are unit length, so
+        # a plain inner product ranks the same as cosine similarity
+        index = faiss.IndexHNSWSQ(
+            EMBEDDING_DIMENSIONS,
+            faiss.ScalarQuantizer.QT_fp16,
+            HNSW_M,
+            faiss.METRIC_INNER_PRODUCT
+        )
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        # FP16 quantization learns no statistics, so a sample satisfies training
+        index.train(vectors[:INDEX_ADD_BATCH_SIZE])
+        for start in range(0, len(vectors), INDEX_ADD_BATCH_SIZE):
+            index.add(vectors[start:start + INDEX_ADD_BATCH_SIZE])
+    finally:
+        # The scratch file is only needed until the vectors are in the index
+        del vectors
+        os.remove(EMBEDDINGS_PATH)
+    
+    # Save the index and a parquet docstore whose row i is index id i
     print(f"\nSaving vectorstore to {INDEX_DIR}/...")
     os.makedirs(INDEX_DIR, exist_ok=True)
-    vectorstore.save_local(INDEX_DIR)
+    faiss.write_index(index, os.path.join(INDEX_DIR, "index.faiss"))
+    write_docstore(documents, os.path.join(INDEX_DIR, "docs.parquet"))
     
     print(f"✅ Vectorstore successfully saved to {INDEX_DIR}/")
     print(f"\n🎉 All done! You can now run the Streamlit app with: streamlit run app.py")